@@ -1,13 +1,19 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from ....services.visit_counter import VisitCounterService
 from ....schemas.counter import VisitCount
 
 router = APIRouter()
 
-# Dependency to get VisitCounterService instance
-def get_visit_counter_service():
-    return VisitCounterService()
+_visit_counter_service: Optional[VisitCounterService] = None
+
+# Dependency to get the shared VisitCounterService instance; async so it is
+# built on the event loop rather than in a threadpool worker
+async def get_visit_counter_service():
+    global _visit_counter_service
+    if _visit_counter_service is None:
+        _visit_counter_service = VisitCounterService()
+    return _visit_counter_service
 
 @router.post("/visit/{page_id}")
 async def record_visit(
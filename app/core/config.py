@@ -8,12 +8,12 @@ class Settings(BaseSettings):
     
     REDIS_PASSWORD: str = ""
     REDIS_DB: int = 0
-    
-    # Consistent Hashing Configuration
-    VIRTUAL_NODES: int = 100
+    REDIS_POOL_SIZE: int = 50
+    COUNTER_SHARDS: int = 1  # Sub-keys per counter; >1 spreads hot pages across nodes
     
     # Batch Processing Configuration
     BATCH_INTERVAL_SECONDS: float = 5.0
+    FLUSH_THRESHOLD: int = 1000  # Buffered keys that trigger an early flush
     
     # Application Configuration
     DEBUG: bool = True
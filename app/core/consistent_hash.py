@@ -1,103 +1,108 @@
-import hashlib
-from typing import List, Dict, Any
-from bisect import bisect
+import xxhash
+from typing import List
 
 class ConsistentHash:
-    def __init__(self, nodes: List[str], virtual_nodes: int = 100):
+    def __init__(self, nodes: List[str]):
         """
-        Initialize the consistent hash ring
-        
+        Initialize the jump consistent hash
+
         Args:
-            nodes: List of node identifiers (parsed from comma-separated string)
-            virtual_nodes: Number of virtual nodes per physical node
+            nodes: List of node identifiers (parsed from comma-separated string),
+                in bucket order; new nodes must be appended to the end
         """
-        self.virtual_nodes = virtual_nodes
-        self.ring = {}  # Hash value -> node mapping
-        self.sorted_keys = []  # Sorted list of hash values
+        self.nodes_list: List[str] = []  # Stable bucket index -> node mapping
         self.nodes = set()  # Set of actual nodes
-        
-        # Add nodes to the ring
+
+        # Keep configured order: jump hash only stays consistent when buckets
+        # are added or removed at the end
         for node in nodes:
             self.add_node(node)
-    
+
     def add_node(self, node: str) -> None:
         """
-        Add a node to the consistent hash ring
-        
+        Add a node as the last bucket
+
         Args:
             node: Node identifier
         """
         if node in self.nodes:
             return
-        
+
         self.nodes.add(node)
-        
-        # Add virtual nodes
-        for i in range(self.virtual_nodes):
-            key = f"{node}:{i}"
-            hash_value = self._hash(key)
-            self.ring[hash_value] = node
-            self.sorted_keys.append(hash_value)
-        
-        # Sort the keys
-        self.sorted_keys.sort()
-    
+        self.nodes_list.append(node)
+
     def remove_node(self, node: str) -> None:
         """
-        Remove a node from the consistent hash ring
-        
+        Remove the node in the last bucket
+
         Args:
-            node: Node identifier
+            node: Node identifier; must be the last node in nodes_list
         """
         if node not in self.nodes:
             return
-        
+
+        if node != self.nodes_list[-1]:
+            # Removing a middle bucket would renumber every later bucket
+            raise ValueError(f"Only the last node ({self.nodes_list[-1]}) can be removed, not {node}")
+
         self.nodes.remove(node)
-        
-        # Remove virtual nodes
-        for i in range(self.virtual_nodes):
-            key = f"{node}:{i}"
-            hash_value = self._hash(key)
-            if hash_value in self.ring:
-                del self.ring[hash_value]
-                self.sorted_keys.remove(hash_value)
-    
+        self.nodes_list.pop()
+
     def get_node(self, key: str) -> str:
         """
         Get the node responsible for the given key
-        
+
         Args:
             key: The key to look up
-            
+
         Returns:
             The node responsible for the key
         """
-        if not self.ring:
+        return self.nodes_list[self.get_bucket(key)]
+
+    def get_bucket(self, key: str) -> int:
+        """
+        Get the index in nodes_list of the node responsible for the given key
+
+        Args:
+            key: The key to look up
+
+        Returns:
+            Bucket index of the node responsible for the key
+        """
+        if not self.nodes_list:
             raise Exception("Hash ring is empty")
-        
-        # Calculate hash of the key
-        hash_value = self._hash(key)
-        
-        # Find the first node in the ring that comes after the key's hash
-        idx = bisect(self.sorted_keys, hash_value)
-        
-        # If no such node exists, wrap around to the first node
-        if idx >= len(self.sorted_keys):
-            idx = 0
-        
-        return self.ring[self.sorted_keys[idx]]
-    
+
+        return self._jump(self._hash(key), len(self.nodes_list))
+
+    @staticmethod
+    def _jump(key_hash: int, num_buckets: int) -> int:
+        """
+        Map a 64-bit key hash to a bucket (Lamping & Veach jump consistent hash)
+
+        Args:
+            key_hash: 64-bit hash of the key
+            num_buckets: Number of buckets
+
+        Returns:
+            Bucket index in the range [0, num_buckets)
+        """
+        b, j = -1, 0
+        while j < num_buckets:
+            b = j
+            key_hash = (key_hash * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+            j = int((b + 1) * (float(1 << 31) / float((key_hash >> 33) + 1)))
+        return b
+
     def _hash(self, key: str) -> int:
         """
         Hash a key to an integer value
-        
+
         Args:
             key: The key to hash
-            
+
         Returns:
             Integer hash value
         """
-        # Use MD5 for consistent hashing
-        hash_obj = hashlib.md5(key.encode('utf-8'))
-        return int(hash_obj.hexdigest(), 16)
-    
\ No newline at end of file
+        # Non-cryptographic 64-bit hash; only uniformity matters here
+        return xxhash.xxh3_64_intdigest(key)
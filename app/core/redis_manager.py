@@ -1,23 +1,79 @@
-import redis
+import redis.asyncio as aioredis
 import asyncio
-from typing import Dict, List, Optional, Any
+import itertools
+from urllib.parse import urlparse
+from typing import Dict, List, Optional, Any, Union
 from .consistent_hash import ConsistentHash
 from .config import settings
 
+INCR_SCRIPT = "return redis.call('INCRBY', KEYS[1], ARGV[1])"
+
+class IncrementAppliedError(Exception):
+    """Raised when an increment was written but reading the counter back failed"""
+
 class RedisManager:
     def __init__(self):
         """Initialize Redis connection pools and consistent hashing"""
-        self.connection_pools: Dict[str, redis.ConnectionPool] = {}
-        self.redis_clients: Dict[str, redis.Redis] = {}
+        self.connection_pools: Dict[str, aioredis.ConnectionPool] = {}
+        self.redis_clients: Dict[str, aioredis.Redis] = {}
+        self._counter_shards = max(1, settings.COUNTER_SHARDS)
+        self._shard_cursor = itertools.count()
         
         redis_nodes = [node.strip() for node in settings.REDIS_NODES.split(",") if node.strip()]
-        self.consistent_hash = ConsistentHash(redis_nodes, settings.VIRTUAL_NODES)
+        # Only change nodes through add_node/remove_node, which keep the
+        # per-bucket lists below in step with the hash
+        self.consistent_hash = ConsistentHash([])
+        
+        # Per-node state indexed by the bucket ids the consistent hash returns
+        self._clients_by_id: List[aioredis.Redis] = []
+        self._served_via_by_id: List[str] = []
+        self._incr_scripts_by_id: List[Any] = []
         
         for node in redis_nodes:
-            self.connection_pools[node] = redis.ConnectionPool.from_url(node)
-            self.redis_clients[node] = redis.Redis(connection_pool=self.connection_pools[node])
+            self.add_node(node)
+
+    def add_node(self, node: str) -> None:
+        """
+        Add a Redis node as the last bucket of the consistent hash
+        
+        Args:
+            node: Redis node URL
+        """
+        if node in self.consistent_hash.nodes:
+            return
+        
+        self.connection_pools[node] = aioredis.BlockingConnectionPool.from_url(
+            node, max_connections=settings.REDIS_POOL_SIZE
+        )
+        self.redis_clients[node] = aioredis.Redis(connection_pool=self.connection_pools[node])
+        
+        port = urlparse(node).port
+        self._clients_by_id.append(self.redis_clients[node])
+        self._served_via_by_id.append(f"redis_{port}" if port else "redis")
+        # Sent as EVALSHA; redis-py loads the script on first NOSCRIPT reply
+        self._incr_scripts_by_id.append(self.redis_clients[node].register_script(INCR_SCRIPT))
+        self.consistent_hash.add_node(node)
+
+    async def remove_node(self, node: str) -> None:
+        """
+        Remove the Redis node in the last bucket and close its pool
+        
+        Args:
+            node: Redis node URL; must be the last configured node
+        """
+        if node not in self.consistent_hash.nodes:
+            return
+        
+        # Raises unless node is the last bucket, before any list is touched
+        self.consistent_hash.remove_node(node)
+        self._clients_by_id.pop()
+        self._served_via_by_id.pop()
+        self._incr_scripts_by_id.pop()
+        
+        del self.redis_clients[node]
+        await self.connection_pools.pop(node).disconnect()
 
-    async def get_connection(self, key: str) -> redis.Redis:
+    async def get_connection(self, key: str) -> (aioredis.Redis, str):
         """
         Get Redis connection for the given key using consistent hashing
         
@@ -25,14 +81,10 @@ class RedisManager:
             key: The key to determine which Redis node to use
             
         Returns:
-            Redis client for the appropriate node
+            Tuple of (client, served_via) for the appropriate node
         """
-        node = self.consistent_hash.get_node(key)
-        
-        if node in self.redis_clients:
-            return self.redis_clients[node], node
-        
-        raise Exception(f"No Redis connection available for node {node}")
+        idx = self.consistent_hash.get_bucket(key)
+        return self._clients_by_id[idx], self._served_via_by_id[idx]
 
     async def increment(self, key: str, amount: int = 1) -> int:
         """
@@ -45,12 +97,50 @@ class RedisManager:
         Returns:
             New value of the counter
         """
-        redis_client, _ = await self.get_connection(key)
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, lambda: redis_client.incrby(key, amount)
-        )
-        return result
+        count, _ = await self.incr_and_get(key, amount)
+        return count
+
+    async def eval_incr(self, key: str, amount: int = 1) -> int:
+        """
+        Increment a counter through the server-side Lua script
+        
+        Args:
+            key: The key to increment
+            amount: Amount to increment by
+            
+        Returns:
+            New value of the counter (of the shard written when counters are sharded)
+        """
+        shard_key = self._shard_key(key)
+        idx = self.consistent_hash.get_bucket(shard_key)
+        return await self._incr_scripts_by_id[idx](keys=[shard_key], args=[amount])
+
+    async def pipeline_increment(self, items: Dict[str, int]) -> Dict[str, int]:
+        """
+        Increment many counters with one pipelined round trip per Redis node
+
+        Args:
+            items: Mapping of key to the amount to increment it by
+
+        Returns:
+            The subset of items whose node could not be written to
+        """
+        buckets: Dict[int, List] = {}
+        for key, amount in items.items():
+            shard_key = self._shard_key(key)
+            buckets.setdefault(self.consistent_hash.get_bucket(shard_key), []).append((key, shard_key, amount))
+
+        failed: Dict[str, int] = {}
+        for idx, bucket in buckets.items():
+            pipe = self._clients_by_id[idx].pipeline(transaction=False)
+            for _, shard_key, amount in bucket:
+                pipe.incrby(shard_key, amount)
+            try:
+                await pipe.execute()
+            except Exception as e:
+                print(f"Error flushing {len(bucket)} keys to {self.consistent_hash.nodes_list[idx]}: {e}")
+                failed.update((key, amount) for key, _, amount in bucket)
+        return failed
 
     async def get(self, key: str) -> (Optional[int], str):
         """
@@ -60,28 +150,34 @@ class RedisManager:
             key: The key to get
             
         Returns:
-            Tuple of (value, node) where value is the key's value and node is the Redis node
+            Tuple of (value, served_via) where value is the key's value
         """
-        redis_client, node = await self.get_connection(key)
-        # Redis operations are blocking, so we run them in a thread pool
-        loop = asyncio.get_event_loop()
-        result = await loop.run_in_executor(
-            None, lambda: redis_client.get(key)
-        )
+        return await self.incr_and_get(key)
+
+    async def incr_and_get(self, key: str, amount: int = 0) -> (int, str):
+        """
+        Apply pending increments to a counter and read it in one round trip
         
-        try:
-            print(f"Node URL: {node}")
+        Args:
+            key: The key to increment and read
+            amount: Amount to increment by; 0 only reads the key
+            
+        Returns:
+            Tuple of (value, served_via) where value is the counter after the increment
             
-            if "redis://" in node:
-                host_port = node.replace("redis://", "").split("/")[0]
-                port = host_port.split(":")[1]
-                served_via = f"redis_{port}"
-            else:
-                served_via = "redis"
-        except (IndexError, ValueError) as e:
-            print(f"Error extracting port: {e}, node: {node}")
-            served_via = "redis"
+        Raises:
+            IncrementAppliedError: The increment was applied but the read failed
+        """
+        if self._counter_shards > 1:
+            return await self._incr_and_sum_shards(key, amount)
+        
+        redis_client, served_via = await self.get_connection(key)
         
+        if amount:
+            # INCRBY replies with the new value, so no separate GET is needed
+            return await redis_client.incrby(key, amount), served_via
+        
+        result = await redis_client.get(key)
         if result is None:
             return 0, served_via
         
@@ -89,3 +185,83 @@ class RedisManager:
             return int(result), served_via
         except (TypeError, ValueError):
             return 0, served_via
+
+    async def _incr_and_sum_shards(self, key: str, amount: int) -> (int, str):
+        """
+        Apply an increment to one shard of a counter and sum all of its shards,
+        plus the unsharded key as a legacy shard
+        
+        Args:
+            key: The logical counter key
+            amount: Amount to add to a round-robin shard; 0 only reads
+            
+        Returns:
+            Tuple of (total, served_via) where served_via names the node holding
+            the incremented shard, or the first shard when only reading
+            
+        Raises:
+            IncrementAppliedError: The increment was applied but the read failed
+        """
+        shard_keys = self._shard_keys(key)
+        
+        # Increment on its own first, so a failed read never hides an applied write
+        incr_key = self._shard_key(key) if amount else shard_keys[0]
+        redis_client, served_via = await self.get_connection(incr_key)
+        if amount:
+            await redis_client.incrby(incr_key, amount)
+        
+        # The bare key still holds any count written before sharding was enabled
+        buckets: Dict[int, List[str]] = {}
+        for shard_key in shard_keys + [key]:
+            buckets.setdefault(self.consistent_hash.get_bucket(shard_key), []).append(shard_key)
+        
+        async def read_node(idx: int, node_keys: List[str]) -> int:
+            values = await self._clients_by_id[idx].mget(node_keys)
+            return sum(int(value) for value in values if value is not None)
+        
+        try:
+            totals = await asyncio.gather(*(read_node(idx, keys) for idx, keys in buckets.items()))
+        except Exception as e:
+            if amount:
+                raise IncrementAppliedError(f"Incremented {incr_key} but reading its shards failed: {e}") from e
+            raise
+        return sum(totals), served_via
+
+    def _shard_key(self, key: Union[str, bytes]) -> Union[str, bytes]:
+        """
+        Pick the next shard of a counter key in round-robin order
+        
+        Args:
+            key: The logical counter key
+            
+        Returns:
+            The Redis key of the chosen shard, or key itself when unsharded
+        """
+        if self._counter_shards == 1:
+            return key
+        return self._with_suffix(key, next(self._shard_cursor) % self._counter_shards)
+
+    def _shard_keys(self, key: Union[str, bytes]) -> List[Union[str, bytes]]:
+        """
+        List the Redis keys of every shard of a counter key
+        
+        Args:
+            key: The logical counter key
+            
+        Returns:
+            Shard keys, or [key] when unsharded
+        """
+        if self._counter_shards == 1:
+            return [key]
+        return [self._with_suffix(key, i) for i in range(self._counter_shards)]
+
+    @staticmethod
+    def _with_suffix(key: Union[str, bytes], shard: int) -> Union[str, bytes]:
+        """Append ':{shard}' to a str or pre-encoded bytes key"""
+        suffix = f":{shard}"
+        return key + suffix.encode() if isinstance(key, bytes) else key + suffix
+
+    async def close(self) -> None:
+        """Close all Redis connection pools"""
+        for pool in self.connection_pools.values():
+            await pool.disconnect()
@@ -1,8 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from redis.utils import HIREDIS_AVAILABLE
 from .core.config import settings
 from .api.v1.api import api_router
-from .services.visit_counter import VisitCounterService
+from .api.v1.endpoints.counter import get_visit_counter_service
 
 app = FastAPI(title="Visit Counter Service")
 
@@ -15,9 +16,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-
-visit_counter_service = VisitCounterService()
-
 @app.get("/")
 async def health_check():
     return {"status": "healthy"}
@@ -25,7 +23,14 @@ async def health_check():
 # Include API router
 app.include_router(api_router, prefix=settings.API_PREFIX)
 
+@app.on_event("startup")
+async def startup_event():
+    """Build the shared visit counter service inside the running event loop"""
+    print(f"Redis reply parser: {'hiredis' if HIREDIS_AVAILABLE else 'pure Python'}")
+    await get_visit_counter_service()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Flush any pending writes when the application shuts down"""
+    visit_counter_service = await get_visit_counter_service()
     await visit_counter_service.shutdown() 
\ No newline at end of file
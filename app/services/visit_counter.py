@@ -1,19 +1,28 @@
 from typing import Dict, List, Any
 import asyncio
+import functools
 import time
 from datetime import datetime
-from ..core.redis_manager import RedisManager
+from ..core.redis_manager import RedisManager, IncrementAppliedError
+from ..core.config import settings
+
+@functools.lru_cache(maxsize=65536)
+def _counter_key(page_id: str) -> bytes:
+    """Build the Redis key for a page's counter, encoded once per page"""
+    return f"visit_counter:{page_id}".encode("utf-8")
 
 class VisitCounterService:
     _visit_counters = {}
     
-    _cache = {}
+    _cache_value: Dict[bytes, int] = {}
+    _cache_expiry: Dict[bytes, float] = {}
     _cache_ttl = 5 
     
     _write_buffer = {}
     _flush_interval = 30  
     _flush_task = None
-    _lock = asyncio.Lock()
+    _flush_event = asyncio.Event()
+    _flush_signalled = False
     
     def __init__(self):
         """Initialize the visit counter service with Redis manager"""
@@ -24,15 +33,24 @@ class VisitCounterService:
     def _start_flush_task(self):
         """Start the background task to flush the write buffer periodically"""
         if VisitCounterService._flush_task is None or VisitCounterService._flush_task.done():
-            loop = asyncio.get_event_loop()
+            loop = asyncio.get_running_loop()
             VisitCounterService._flush_task = loop.create_task(self._periodic_flush())
     
     async def _periodic_flush(self):
         """Periodically flush the write buffer to Redis"""
         while True:
             try:
-                await asyncio.sleep(VisitCounterService._flush_interval)
-                await self._flush_buffer_to_redis()
+                try:
+                    await asyncio.wait_for(
+                        VisitCounterService._flush_event.wait(),
+                        timeout=VisitCounterService._flush_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                VisitCounterService._flush_event.clear()
+                if await self._flush_buffer_to_redis():
+                    # Back off so a buffer refilled by a failed flush can't retrigger at once
+                    await asyncio.sleep(5)
             except asyncio.CancelledError:
              
                 await self._flush_buffer_to_redis()
@@ -42,30 +60,38 @@ class VisitCounterService:
               
                 await asyncio.sleep(5)  
     
-    async def _flush_buffer_to_redis(self):
-        """Flush all pending writes in the buffer to Redis"""
-        async with VisitCounterService._lock:
-            buffer_copy = dict(VisitCounterService._write_buffer)
-            
-            if not buffer_copy:
-                return 
-                
-            VisitCounterService._write_buffer.clear()
+    async def _flush_buffer_to_redis(self) -> bool:
+        """
+        Flush all pending writes in the buffer to Redis
         
-    
-        for key, count in buffer_copy.items():
-            if count > 0:
-                try:
-                    await self.redis_manager.increment(key, count)
-         
-                    self._invalidate_cache(key)
-                except Exception as e:
-                    print(f"Error flushing key {key} to Redis: {e}")
-             
-                    async with VisitCounterService._lock:
-                        if key not in VisitCounterService._write_buffer:
-                            VisitCounterService._write_buffer[key] = 0
-                        VisitCounterService._write_buffer[key] += count
+        Returns:
+            True if some writes failed and were put back into the buffer
+        """
+        # Swap in a fresh buffer; no await in between, so no increment is lost
+        buffer_copy = VisitCounterService._write_buffer
+        VisitCounterService._write_buffer = {}
+        VisitCounterService._flush_signalled = False
+
+        buffer_copy = {key: count for key, count in buffer_copy.items() if count > 0}
+        if not buffer_copy:
+            return False
+
+        try:
+            failed = await self.redis_manager.pipeline_increment(buffer_copy)
+        except Exception as e:
+            print(f"Error flushing buffer to Redis: {e}")
+            failed = buffer_copy
+
+        write_buffer = VisitCounterService._write_buffer
+        for key, count in failed.items():
+            write_buffer[key] = write_buffer.get(key, 0) + count
+
+        # Failed keys too: a read during the flush may have cached a value that
+        # hides the counts just put back
+        for key in buffer_copy:
+            self._invalidate_cache(key)
+        
+        return bool(failed)
 
     async def increment_visit(self, page_id: str) -> None:
         """
@@ -74,12 +100,7 @@ class VisitCounterService:
         Args:
             page_id: Unique identifier for the page
         """
-   
-        if page_id not in self._visit_counters:
-            self._visit_counters[page_id] = 0
-            
-
-        self._visit_counters[page_id] += 1
+        self._visit_counters[page_id] = self._visit_counters.get(page_id, 0) + 1
 
     async def get_visit_count(self, page_id: str) -> int:
         """
@@ -101,15 +122,16 @@ class VisitCounterService:
         Args:
             page_id: Unique identifier for the page
         """
-        key = f"visit_counter:{page_id}"
+        key = _counter_key(page_id)
         
-
-        async with VisitCounterService._lock:
-            if key not in VisitCounterService._write_buffer:
-                VisitCounterService._write_buffer[key] = 0
-            VisitCounterService._write_buffer[key] += 1
+        # No await here, so the update is atomic with respect to other tasks
+        write_buffer = VisitCounterService._write_buffer
+        write_buffer[key] = write_buffer.get(key, 0) + 1
+        # FLUSH_THRESHOLD counts distinct buffered keys; signal once per buffer swap
+        if not VisitCounterService._flush_signalled and len(write_buffer) >= settings.FLUSH_THRESHOLD:
+            VisitCounterService._flush_signalled = True
+            VisitCounterService._flush_event.set()
         
-
         self._invalidate_cache(key)
         
     async def get_visit_count_redis(self, page_id: str) -> (int, str):
@@ -122,29 +144,32 @@ class VisitCounterService:
         Returns:
             Tuple of (count, source) where source is 'in_memory', 'redis_7070', or 'redis_7071'
         """
-        key = f"visit_counter:{page_id}"
-        
-        pending_count = 0
-        async with VisitCounterService._lock:
-            pending_count = VisitCounterService._write_buffer.get(key, 0)
-            if pending_count > 0:
-                del VisitCounterService._write_buffer[key]
-        
-        if key in self._cache and self._cache[key]['expires_at'] > time.time():
-            total_count = self._cache[key]['value'] + pending_count
-            return total_count, 'in_memory'
-        
-        count, served_via = await self.redis_manager.get(key)
-        
-        if pending_count > 0:
-            await self.redis_manager.increment(key, pending_count)
-            count += pending_count
+        key = _counter_key(page_id)
+        
+        expires_at = self._cache_expiry.get(key)
+        if expires_at is not None and expires_at > time.monotonic():
+            # Add visits buffered since the value was cached, e.g. while its read was in flight
+            return self._cache_value[key] + VisitCounterService._write_buffer.get(key, 0), 'in_memory'
+        
+        pending_count = VisitCounterService._write_buffer.pop(key, 0)
+        
+        try:
+            count, served_via = await self.redis_manager.incr_and_get(key, pending_count)
+        except IncrementAppliedError:
+            # The pending visits reached Redis; restoring them would count them twice
+            raise
+        except Exception:
+            # Hand the pending visits back to the buffer for the next flush
+            if pending_count:
+                write_buffer = VisitCounterService._write_buffer
+                write_buffer[key] = write_buffer.get(key, 0) + pending_count
+            raise
         
         self._update_cache(key, count)
         
         return count, served_via
     
-    def _update_cache(self, key: str, value: int) -> None:
+    def _update_cache(self, key: bytes, value: int) -> None:
         """
         Update the cache with a new value and expiration time
         
@@ -152,20 +177,18 @@ class VisitCounterService:
             key: The key to cache
             value: The value to cache
         """
-        self._cache[key] = {
-            'value': value,
-            'expires_at': time.time() + self._cache_ttl
-        }
+        self._cache_value[key] = value
+        self._cache_expiry[key] = time.monotonic() + self._cache_ttl
     
-    def _invalidate_cache(self, key: str) -> None:
+    def _invalidate_cache(self, key: bytes) -> None:
         """
         Invalidate a cached value
         
         Args:
             key: The key to invalidate
         """
-        if key in self._cache:
-            del self._cache[key]
+        self._cache_expiry.pop(key, None)
+        self._cache_value.pop(key, None)
             
     async def shutdown(self):
         """Clean up resources and flush buffer before shutdown"""
@@ -176,4 +199,6 @@ class VisitCounterService:
             try:
                 await VisitCounterService._flush_task
             except asyncio.CancelledError:
-                pass
\ No newline at end of file
+                pass
+
+        await self.redis_manager.close()
\ No newline at end of file